@@ -9,11 +9,14 @@ from homeassistant.util.scaling import scale_to_ranged_value
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
     ATTR_COLOR_TEMP_KELVIN,
+    ATTR_EFFECT,
+    ATTR_TRANSITION,
     ColorMode,
     LightEntity,
+    LightEntityFeature,
 )
 
-from xiaomi_lightbar import Lightbar
+from xiaomi_lightbar import Lightbar, TransitionEngine, SceneCache, Bridge, State
 
 from .const import (
     DOMAIN, DEVICE_ID, CE_PIN, CS_PIN,
@@ -46,6 +49,8 @@ class LightbarEntity(LightEntity):
         self._attr_supported_color_modes = [ColorMode.COLOR_TEMP]
         self._attr_min_color_temp_kelvin = KELVIN_SCALE[0]
         self._attr_max_color_temp_kelvin = KELVIN_SCALE[1]
+        self._attr_supported_features = (LightEntityFeature.TRANSITION
+                                          | LightEntityFeature.EFFECT)
 
         if ce_pin >= 0:
             try:
@@ -54,6 +59,15 @@ class LightbarEntity(LightEntity):
                 raise CannotConnect
         else:  # Just for debugging
             self._device = DummyLightbar(ce_pin, cs_pin, device_id)
+        self._transitions = TransitionEngine(self._device, on_done=self._transition_done)
+        self._scenes = SceneCache()
+        self._attr_effect_list = list(self._scenes.scenes)
+
+        # Track the changes done with the physical remote (same id)
+        self._state = State(on=False)
+        self._bridge = None
+        if ce_pin >= 0:
+            self._bridge = Bridge(self._device, self._state, self._remote_changed)
 
         _LOGGER.debug("LightbarEntity constructor (%s %s %s)",
                       ce_pin, cs_pin, device_id)
@@ -62,31 +76,95 @@ class LightbarEntity(LightEntity):
     def unique_id(self):
         return f"{self._device.id:0{6}x}"
 
+    async def async_added_to_hass(self):
+        if self._bridge is not None:
+            await self.hass.async_add_executor_job(self._bridge.start)
+
+    async def async_will_remove_from_hass(self):
+        if self._bridge is not None:
+            await self.hass.async_add_executor_job(self._bridge.stop)
+
+    def _remote_changed(self, delta):
+        """Called from the bridge thread, with the changes of the remote"""
+        _LOGGER.debug("Remote %s", delta)
+        self._transitions.stop()  # The remote takes over, no join from this thread
+        if "on" in delta:
+            self._attr_is_on = delta["on"]
+        if delta.get("brightness") is not None:
+            self._transitions.brightness = delta["brightness"]
+            self._attr_brightness = round(scale_to_ranged_value(
+                BRIGHTNESS_SCALE, (0, 255), delta["brightness"]))
+        if delta.get("color_temp") is not None:
+            self._transitions.color_temp = delta["color_temp"]
+            self._attr_color_temp_kelvin = round(scale_to_ranged_value(
+                COLOR_TEMP_SCALE, KELVIN_SCALE, delta["color_temp"]))
+        self._attr_effect = None
+        self.schedule_update_ha_state()
+
+    def _transition_done(self, values):
+        """Called from the transition thread, with the values reached"""
+        self._sync_state(**values)
+
+    def _sync_state(self, **fields):
+        """Update the state tracked by the bridge with our own commands"""
+        self._state.update(**{k: v for k, v in fields.items() if v is not None})
+
     def turn_on(self, **kwargs):
         _LOGGER.debug("Turning on %s", kwargs)
+        self._transitions.cancel()
         if not self.is_on:
             self._device.on_off()
             self._attr_is_on = True
 
+        brightness_val = None
         if ATTR_BRIGHTNESS in kwargs:
             brightness = kwargs[ATTR_BRIGHTNESS]
             self._attr_brightness = brightness
             val = scale_to_ranged_value((0, 255), BRIGHTNESS_SCALE, brightness)
-            self._device.brightness(int(val))
+            brightness_val = int(val)
             _LOGGER.debug("Brightness %s", val)
 
+        color_temp_val = None
         if ATTR_COLOR_TEMP_KELVIN in kwargs:
             kelvin = kwargs[ATTR_COLOR_TEMP_KELVIN]
             self._attr_color_temp_kelvin = kelvin
             val = scale_to_ranged_value(KELVIN_SCALE, COLOR_TEMP_SCALE, kelvin)
-            self._device.color_temp(int(val))
+            color_temp_val = int(val)
             _LOGGER.debug("Kelvin %s", val)
 
+        effect = kwargs.get(ATTR_EFFECT)
+        if effect in self._scenes.scenes:
+            # The scene is played at once, then the explicit values if any
+            scene = self._scenes.play(effect, self._device)
+            self._attr_effect = scene.name
+            if scene.brightness is not None:
+                self._transitions.brightness = scene.brightness
+                self._attr_brightness = round(scale_to_ranged_value(
+                    BRIGHTNESS_SCALE, (0, 255), scene.brightness))
+            if scene.color_temp is not None:
+                self._transitions.color_temp = scene.color_temp
+                self._attr_color_temp_kelvin = round(scale_to_ranged_value(
+                    COLOR_TEMP_SCALE, KELVIN_SCALE, scene.color_temp))
+            self._sync_state(brightness=scene.brightness, color_temp=scene.color_temp)
+            _LOGGER.debug("Effect %s", scene.name)
+            transition = 0
+        else:
+            if brightness_val is not None or color_temp_val is not None:
+                self._attr_effect = None
+            # Without transition, or unknown previous value, set at once
+            transition = kwargs.get(ATTR_TRANSITION, 0)
+        self._transitions.set(brightness_val, color_temp_val, transition)
+        # The values set at once, the faded ones are synced when the fade ends
+        self._sync_state(on=True, brightness=self._transitions.brightness,
+                         color_temp=self._transitions.color_temp)
+
     def turn_off(self, **kwargs):
         _LOGGER.debug("Turning off %s", kwargs)
+        self._transitions.cancel()
         if self.is_on:
             self._attr_is_on = False
             self._device.on_off()
+        self._sync_state(on=False)
 
 
 class CannotConnect(HomeAssistantError):
@@ -100,3 +178,6 @@ class DummyLightbar(Lightbar):
         self.counter = 0
         self.repetitions = 0
         self.id = device_id
+
+    def transmit_all(self, pkts, repetitions=None):
+        pass
@@ -1,5 +1,7 @@
+import json
 import paho.mqtt.client as mqtt
-from xiaomi_lightbar import Lightbar
+from xiaomi_lightbar import Lightbar, Scene, SceneCache, Bridge, State
+from xiaomi_lightbar.scene import DEFAULT_CACHE
 import argparse
 
 description = """
@@ -17,6 +19,8 @@ parser.add_argument("--topic", type=str, default="xiaomi/lightbar", help="MQTT T
 parser.add_argument("--ce_pin", type=int, default=25, help="CE Pin")
 parser.add_argument("--csn_pin", type=int, default=0, help="CSN Pin")
 parser.add_argument("--remote_id", type=lambda x: int(x, 16), default=0xABCDEF, help="Remote ID")
+parser.add_argument("--scenes", type=str, default=DEFAULT_CACHE, help="Compiled scenes cache file")
+parser.add_argument("--bridge", action="store_true", help="Listen to the physical remote and publish the state")
 
 args = parser.parse_args()
 
@@ -28,12 +32,15 @@ PORT = args.port
 USERNAME = args.username
 PASSWORD = args.password
 TOPIC = args.topic
+SCENES = args.scenes
+BRIDGE = args.bridge
 
 # Create Lightbar and MqttController instances
 lightbar = Lightbar(ce_pin=CE_PIN, csn_pin=CSN_PIN, remote_id=REMOTE_ID)
+scenes = SceneCache(SCENES)
 
 class MqttController:
-    def __init__(self, broker, port, username, password, topic, lightbar):
+    def __init__(self, broker, port, username, password, topic, lightbar, scenes, bridge=False):
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         if username != "":
             self.client.username_pw_set(username, password)
@@ -41,9 +48,11 @@ class MqttController:
         self.port = port
         self.topic = topic + "/#"
         self.lightbar = lightbar
-        # Store the previous control state to avoid sending the same on_off command multiple times
-        # we assume the default state to be ON
-        self.previous_control_state = "ON"
+        self.scenes = scenes
+        # Store the state to avoid sending the same on_off command multiple times
+        # we assume the default state to be ON. With the bridge, the physical remote updates it too.
+        self.state = State(on=True)
+        self.bridge = Bridge(lightbar, self.state, self.publish_state) if bridge else None
 
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
@@ -57,6 +66,7 @@ class MqttController:
         if rc == 0:
             print("Connected to MQTT Broker!")
             client.subscribe(self.topic)
+            self.publish_state()
         else:
             print(f"Failed to connect, return code: {rc}")
             self.stop()
@@ -65,33 +75,76 @@ class MqttController:
         print(f"{msg.topic} {msg.payload}")
         if msg.topic == self.topic.replace("#", "control"):
             if msg.payload == b"ON":
-                if self.previous_control_state != "ON":
+                if not self.state.on:
                     self.lightbar.on_off()
-                    self.previous_control_state = "ON"
+                    self.set_state(on=True)
             if msg.payload == b"OFF":
-                if self.previous_control_state != "OFF":
+                if self.state.on:
                     self.lightbar.on_off()
-                    self.previous_control_state = "OFF"
+                    self.set_state(on=False)
 
         elif msg.topic == self.topic.replace("#", "brightness/set"):
             val = int(msg.payload)
             scaled_val = round((val / 255) * 15)
             print(f"Brightness: {scaled_val}")
             self.lightbar.brightness(scaled_val)
+            self.set_state(brightness=scaled_val)
         elif msg.topic == self.topic.replace("#", "temperature/set"):
             val = int(msg.payload)
             scaled_val = scale_value(val)
             print(f"temperature: {scaled_val}")
             self.lightbar.color_temp(scaled_val)
+            self.set_state(color_temp=scaled_val)
+        elif msg.topic.startswith(self.topic.replace("#", "scene/")):
+            # scene/set with the name as payload, or scene/<name>
+            # scene/add defines a scene, {"name": ..., "brightness": ..., "color_temp": ...}
+            name = msg.topic.rsplit("/", 1)[1]
+            if name == "add":
+                try:
+                    scene = Scene.from_dict(json.loads(msg.payload))
+                except ValueError as e:  # Including invalid JSON
+                    print(f"Invalid scene: {e}")
+                    return
+                self.scenes.add(scene)
+                print(f"Scene added: {scene.name}")
+                return
+            if name == "set":
+                name = msg.payload.decode()
+            if name in self.scenes.scenes:
+                print(f"Scene: {name}")
+                scene = self.scenes.play(name, self.lightbar)
+                fields = {"brightness": scene.brightness, "color_temp": scene.color_temp}
+                self.set_state(**{k: v for k, v in fields.items() if v is not None})
+            else:
+                print(f"Unknown scene: {name}")
+
+    def set_state(self, **fields):
+        if self.state.update(**fields):
+            self.publish_state()
+
+    def publish_state(self, delta=None):
+        """Publish the state, e.g. {"state": "ON", "brightness": 255, "temp": 153}"""
+        payload = {"state": "ON" if self.state.on else "OFF"}
+        if self.state.brightness is not None:
+            payload["brightness"] = round(self.state.brightness / 15 * 255)
+        if self.state.color_temp is not None:
+            payload["temp"] = unscale_value(self.state.color_temp)
+        if delta is not None:
+            print(f"Remote: {delta}")
+        self.client.publish(self.topic.replace("#", "state"), json.dumps(payload), retain=True)
 
     def start(self):
         try:
             self.client.connect(self.broker, self.port, 60)
             self.client.loop_start()
+            if self.bridge is not None:
+                self.bridge.start()
         except Exception as e:
             print(f"Failed to connect to MQTT broker: {e}")
 
     def stop(self):
+        if self.bridge is not None:
+            self.bridge.stop()
         self.client.loop_stop()
         self.client.disconnect()
 
@@ -108,9 +161,17 @@ def scale_value(t):
         f_t = None
     return round(f_t) if f_t is not None else None
 
+def unscale_value(v):
+    """Inverse of scale_value, from [0, 15] to mireds"""
+    if v >= 7:
+        t = 153 + (219 - 153) * ((15 - v) / (15 - 7))
+    else:
+        t = 219 + (370 - 219) * ((7 - v) / 7)
+    return round(t)
+
 def main():
     try:
-        with MqttController(BROKER, PORT, USERNAME, PASSWORD, TOPIC, lightbar) as controller:
+        with MqttController(BROKER, PORT, USERNAME, PASSWORD, TOPIC, lightbar, scenes, BRIDGE) as controller:
             controller.start()
             while True:  # Keep the program running
                 pass
@@ -12,4 +12,7 @@ setup(name='xiaomi_lightbar_nrf24',
           'pyrf24',
           'crc',
       ],
+      entry_points={
+          'console_scripts': ['lightbar=xiaomi_lightbar.cli:main'],
+      },
       zip_safe=False)
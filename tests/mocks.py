@@ -0,0 +1,77 @@
+import threading
+from contextlib import contextmanager
+from collections import deque
+
+# Recording mocks of the radio and the Lightbar, to test without hardware
+
+
+class MockRadio:
+    """Records the written packets, instead of transmitting them.
+
+    log, optional, is a list shared by several radios, with the written
+    packets of all of them in order.
+    """
+
+    def __init__(self, log: list = None):
+        self.written = []
+        self.threads = set()  # Threads that wrote
+        self.log = log
+
+    def write(self, pkt: bytes):
+        self.written.append(pkt)
+        if self.log is not None:
+            self.log.append(pkt)
+        self.threads.add(threading.current_thread())
+        return True
+
+
+class MockBar:
+    """Records the bursts of a Lightbar, instead of transmitting them.
+
+    bursts is a list of (packet, repetitions) for transmit, and of
+    (method name, value) for the absolute commands. loops counts the calls
+    to transmit_all, and transmitting_now is True in method transmitting.
+    receive returns the queued raw frames.
+    """
+
+    def __init__(self, id: int = 0xABCDEF, counter: int = 0, frames: list = ()):
+        self.id = id
+        self.counter = counter
+        self.bursts = []
+        self.loops = 0
+        self.transmitting_now = False
+        self.sent = deque(maxlen=32)
+        self.frames = deque(frames)
+
+    def next_counter(self):
+        counter = self.counter
+        self.counter = (counter + 1) % 256
+        return counter
+
+    def transmit(self, pkt: bytes, repetitions: int = None):
+        self.transmit_all([pkt], repetitions)
+
+    def transmit_all(self, pkts: list, repetitions: int = None):
+        self.bursts.extend((pkt, repetitions) for pkt in pkts)
+        self.sent.extend(pkt[12:15] for pkt in pkts)
+        self.loops += 1
+
+    @contextmanager
+    def transmitting(self):
+        self.transmitting_now = True
+        try:
+            yield
+        finally:
+            self.transmitting_now = False
+
+    def listen(self):
+        pass
+
+    def receive(self):
+        return self.frames.popleft() if self.frames else None
+
+    def brightness(self, value: int):
+        self.bursts.append(("brightness", value))
+
+    def color_temp(self, value: int):
+        self.bursts.append(("color_temp", value))
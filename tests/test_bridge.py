@@ -0,0 +1,43 @@
+from xiaomi_lightbar.bridge import decode, step, State, Bridge
+from xiaomi_lightbar.baseband import packet
+from mocks import MockBar
+
+
+def received(id: int, command: int, counter: int, leading: int = 0x3412, junk: int = 0x1A5):
+    """Raw bytes as received by the nRF24L01, with 15 leading bits (the end of
+    the preamble by default) and 9 junk bits"""
+    payload = int.from_bytes(packet(id, command, counter)[8:], "big")
+    return (((leading & 0x7FFF) << 81) | (payload << 9) | junk).to_bytes(12, "big")
+
+
+assert decode(received(0xABCDEF, 0x0401, 7)) == {
+    "id": 0xABCDEF, "separator": 0xFF, "counter": 7, "command": 0x0401,
+    "crc": int.from_bytes(packet(0xABCDEF, 0x0401, 7)[-2:], "big")}
+for leading in (0x0000, 0x1234, 0x7FFF):  # Leading zeros too
+    assert decode(received(0xABCDEF, 0x0401, 7, leading))["counter"] == 7
+bad = bytearray(received(0xABCDEF, 0x0401, 7))
+bad[5] ^= 0x10
+assert decode(bytes(bad)) is None
+
+assert [step(c) for c in (0x0201, 0x03FF, 0x02F0, 0x040F)] == [1, -1, -16, 15]
+
+state = State()
+assert state.apply(0x0401) == {}  # Unknown brightness
+assert state.apply(0x04F0) == {"brightness": 0}
+assert state.apply(0x0403) == {"brightness": 3}
+assert state.apply(0x0100) == {"on": False}
+assert state.update(brightness=3, color_temp=4) == {"color_temp": 4}
+
+changes = []
+bar = MockBar(frames=[
+    received(0xABCDEF, 0x0100, 0x10),  # Echo
+    received(0x123456, 0x0100, 0x20),  # Other remote
+    received(0xABCDEF, 0x0100, 0x21),
+    received(0xABCDEF, 0x0100, 0x21),  # Same burst
+    received(0xABCDEF, 0x03FF, 0x22),
+])
+bar.transmit(packet(0xABCDEF, 0x0100, 0x10))  # Our own on_off
+bridge = Bridge(bar, State(color_temp=5), changes.append)
+while bridge.poll() is not None:
+    pass
+assert changes == [{"on": False}, {"color_temp": 4}]
@@ -0,0 +1,61 @@
+from xiaomi_lightbar import RadioPool
+from xiaomi_lightbar.baseband import packet
+from mocks import MockRadio
+
+radios = [MockRadio(), MockRadio(), MockRadio()]
+pool = RadioPool(radios, mapping={0x111111: 2}, repetitions=2, delay_s=0.001)
+pool.send(0x111111, 0x0100)
+pool.send(0x222222, 0x0100)
+pool.send(0x333333, 0x0100)
+pool.send(0x222222, 0x0401)
+pool.send(0x444444, 0x0600, critical=True)
+pool.wait()
+
+assert pool.mapping[0x111111] == 2
+assert len(set(pool.mapping.values())) == 3  # One remote id per radio
+i = pool.mapping[0x222222]
+assert [p for p in radios[i].written if p[8:11] == bytes([0x22]*3)] == \
+    2*[packet(0x222222, 0x0100, 0)] + 2*[packet(0x222222, 0x0401, 1)]
+for radio in radios:  # Critical command, same counter everywhere
+    assert radio.written.count(packet(0x444444, 0x0600, 0)) == 2
+assert sum(pool.commands) == 4 + 3
+assert all(0 < u < 1 for u in pool.utilization())
+assert len(set().union(*(r.threads for r in radios))) == 3  # One thread per radio
+pool.close()
+
+# The commands of a remote id reach the air in order, with a critical one
+# in the middle (no late copy of a previous counter)
+log = []
+radios = [MockRadio(log), MockRadio(log)]
+pool = RadioPool(radios, mapping={0xABCDEF: 0}, repetitions=3, delay_s=0.001)
+pool.send(0xABCDEF, 0x0100)
+pool.send(0xABCDEF, 0x0600, critical=True)
+pool.send(0xABCDEF, 0x0401)
+pool.wait()
+counters = [pkt[12] for pkt in log]
+assert counters == sorted(counters)
+assert counters == 3*[0] + 6*[1] + 3*[2]
+pool.close()
+
+
+class FailingRadio(MockRadio):
+    def write(self, pkt: bytes):
+        raise OSError("radio unplugged")
+
+
+# An error of a radio is raised by wait, the pool does not hang
+radios = [MockRadio(), FailingRadio()]
+pool = RadioPool(radios, mapping={0x111111: 0, 0x222222: 1}, repetitions=2, delay_s=0.001)
+pool.send(0x222222, 0x0100)
+pool.send(0x111111, 0x0100)
+try:
+    pool.wait()
+except OSError as e:
+    assert str(e) == "radio unplugged"
+else:
+    raise AssertionError("no error")
+assert radios[0].written == 2*[packet(0x111111, 0x0100, 0)]
+assert pool.schedulers[1].pending == 0 and not pool.schedulers[1].busy(0x222222)
+pool.send(0x111111, 0x0401)  # The pool still works
+pool.close()
+assert radios[0].written[-1] == packet(0x111111, 0x0401, 1)
@@ -0,0 +1,49 @@
+import os
+import json
+import tempfile
+from xiaomi_lightbar import Scene, SceneCache
+from xiaomi_lightbar.baseband import packet
+from mocks import MockBar
+
+assert Scene("a", brightness=20, color_temp=3).codes() == [0x04F0, 0x040F, 0x02F0, 0x0203]
+assert Scene("b", color_temp=0).codes() == [0x02F0, 0x0200]
+
+path = os.path.join(tempfile.mkdtemp(), "scenes.json")
+cache = SceneCache(path)
+bar = MockBar()
+assert cache.play("night", bar).brightness == 0
+assert bar.bursts == [(packet(0xABCDEF, code, i), None)
+                      for i, code in enumerate([0x04F0, 0x0400, 0x02F0, 0x0200])]
+assert bar.loops == 1  # All the packets in a single transmit loop
+
+# The custom scenes are stored, and loaded again with the presets
+cache.add(Scene("coding", brightness=9, color_temp=12))
+cache = SceneCache(path)
+assert {"reading", "night", "presentation", "coding"} <= set(cache.scenes)
+bar = MockBar(counter=4)
+scene = cache.play("coding", bar)
+assert (scene.brightness, scene.color_temp) == (9, 12)
+assert [pkt for pkt, _ in bar.bursts] == [packet(0xABCDEF, code, 4 + i)
+                                          for i, code in enumerate([0x04F0, 0x0409, 0x02F0, 0x020C])]
+cache.remove("coding")
+assert "coding" not in SceneCache(path).scenes
+
+# A removed preset stays removed, its programs are dropped
+cache = SceneCache(path)
+cache.play("night", MockBar())
+cache.remove("night")
+with open(path) as f:
+    assert not any(key.startswith(("night:", "coding:")) for key in json.load(f)["programs"])
+cache = SceneCache(path)
+assert "night" not in cache.scenes
+cache.add(Scene("night", brightness=1))
+assert SceneCache(path).scenes["night"].brightness == 1
+
+# Scenes received as dicts (e.g. JSON) are validated
+assert Scene.from_dict({"name": "x", "color_temp": 3}).codes() == [0x02F0, 0x0203]
+for data in ([], {}, {"name": 3}, {"name": "x", "brightness": 16}, {"name": "x", "color_temp": "3"}):
+    try:
+        Scene.from_dict(data)
+    except ValueError:
+        continue
+    raise AssertionError(data)
@@ -0,0 +1,54 @@
+from xiaomi_lightbar import Scheduler
+from xiaomi_lightbar.baseband import packet
+from mocks import MockRadio, MockBar
+
+radio = MockRadio()
+scheduler = Scheduler(radio, repetitions=3, delay_s=0.001)
+scheduler.submit(0xABCDEF, 0x0100)
+scheduler.submit(0xABCDEF, 0x0401)
+scheduler.submit(0x123456, 0x0100)
+latency = scheduler.run()
+
+a0 = packet(0xABCDEF, 0x0100, 0)
+a1 = packet(0xABCDEF, 0x0401, 1)
+b0 = packet(0x123456, 0x0100, 0)
+
+# Both remote ids are interleaved, the commands of each one are in order
+assert radio.written[:2] == [b0, a0] or radio.written[:2] == [a0, b0]
+assert [p for p in radio.written if p != b0] == 3*[a0] + 3*[a1]
+assert radio.written.count(b0) == 3
+assert set(latency) == {0xABCDEF, 0x123456}
+assert latency[0x123456] < latency[0xABCDEF]
+assert scheduler.pending == 0
+
+# The counter is shared with a Lightbar of the same remote id
+bar = MockBar(0xABCDEF, counter=7)
+radio = MockRadio()
+scheduler = Scheduler(radio, repetitions=1, delay_s=0.001, bars=[bar])
+scheduler.submit(0xABCDEF, 0x0100)
+scheduler.run()
+assert radio.written == [packet(0xABCDEF, 0x0100, 7)]
+assert bar.next_counter() == 8
+
+# The bar is held in transmit mode during the run, its packets are not echoes
+assert not bar.transmitting_now
+assert packet(0xABCDEF, 0x0100, 7)[12:15] in bar.sent
+
+
+class SubmittingRadio(MockRadio):
+    """Submits a command for another remote id while the scheduler runs"""
+
+    def write(self, pkt: bytes):
+        if not self.written:
+            assert bar.transmitting_now
+            scheduler.submit(0x123456, 0x0100)
+        return super().write(pkt)
+
+
+# A remote id submitted during a run is transmitted by the same run
+radio = SubmittingRadio()
+scheduler = Scheduler(radio, repetitions=2, delay_s=0.001, bars=[bar])
+scheduler.submit(0xABCDEF, 0x0100)
+scheduler.run()
+assert radio.written.count(packet(0x123456, 0x0100, 0)) == 2
+assert scheduler.pending == 0 and not scheduler.busy(0x123456)
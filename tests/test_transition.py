@@ -0,0 +1,56 @@
+from xiaomi_lightbar.transition import plan, Transition, TransitionEngine
+from xiaomi_lightbar.baseband import packet
+from mocks import MockBar
+
+steps = plan("brightness", 2, 5, 0.03)
+assert [code for _, code, _, _ in steps] == 3*[0x0401]
+assert [value for _, _, _, value in steps] == [3, 4, 5]
+assert steps[-1][0] == 0.03
+assert plan("color_temp", 15, 13, 1) == [(0.5, 0x03FF, "color_temp", 14),
+                                         (1.0, 0x03FF, "color_temp", 13)]
+assert plan("brightness", 7, 7, 1) == []
+
+bar = MockBar()
+transition = Transition(bar, steps, repetitions=2)
+assert transition.run()
+assert bar.bursts == [(packet(0xABCDEF, 0x0401, 0), 2),
+                      (packet(0xABCDEF, 0x0401, 1), 2),
+                      (packet(0xABCDEF, 0x0401, 2), None)]  # Last one, full burst
+assert transition.values == {"brightness": 5}
+
+# Both parameters, the last step of each one is a full burst
+bar = MockBar()
+transition = Transition(bar, steps + plan("color_temp", 0, 3, 0.03), repetitions=2)
+assert transition.run()
+codes = [(int.from_bytes(pkt[13:15], "big"), repetitions) for pkt, repetitions in bar.bursts]
+assert codes == [(0x0201, 2), (0x0401, 2), (0x0201, 2), (0x0401, 2),
+                 (0x0201, None), (0x0401, None)]
+assert transition.values == {"brightness": 5, "color_temp": 3}
+
+transition = Transition(bar, steps)
+transition.cancel()
+assert not transition.run()
+
+bar = MockBar()
+engine = TransitionEngine(bar)
+assert engine.set(brightness=4, duration_s=1) is None  # Unknown start
+assert bar.bursts == [("brightness", 4)]
+assert engine.set(brightness=6, duration_s=0.01) is not None
+engine.wait()
+assert engine.brightness == 6
+assert len(bar.bursts) == 3
+
+# on_done gets the values reached, stop discards them (e.g. remote change)
+done = []
+bar = MockBar()
+engine = TransitionEngine(bar, on_done=done.append)
+engine.brightness = 0
+engine.set(brightness=2, duration_s=0.01)
+engine.wait()
+assert done == [{"brightness": 2}]
+engine.set(brightness=15, duration_s=10)
+engine.stop()
+engine.brightness = 9  # Value of the remote
+engine.wait()
+assert engine.brightness == 9
+assert done == [{"brightness": 2}]
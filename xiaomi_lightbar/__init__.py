@@ -1 +1,4 @@
-from .radio import Lightbar
+from .radio import Lightbar, Scheduler, RadioPool
+from .transition import TransitionEngine
+from .scene import Scene, SceneCache
+from .bridge import Bridge, State
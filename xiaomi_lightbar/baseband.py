@@ -56,7 +56,19 @@ crc16_config = crc.Configuration(
 crc16 = crc.Calculator(crc16_config)
 
 
-def packet(id: int, command: int, counter: int) -> bytes:
+def header(id: int) -> bytes:
+    """Build the leading bytes of a packet, common to all the commands of a remote.
+
+    Arguments:
+    id: id of the remote, as 3 byte long int (e.g. 0x5421FE)
+    """
+    x = preamble.to_bytes(8, 'big')
+    x += id.to_bytes(3, 'big')
+    x += separator.to_bytes(1, 'big')
+    return x
+
+
+def packet(id: int, command: int, counter: int, head: bytes = None) -> bytes:
     """Build a packet for the Xiaomi light bar.
 
     Arguments:
@@ -64,10 +76,9 @@ def packet(id: int, command: int, counter: int) -> bytes:
     command: a 2 byte int code, e. g. 0x0100.
              Invalid codes are silently ignored by the bar.
     counter: int in range(0, 256), to reject repeated packets
+    head: precomputed header(id), optional
     """
-    x = preamble.to_bytes(8, 'big')
-    x += id.to_bytes(3, 'big')
-    x += separator.to_bytes(1, 'big')
+    x = header(id) if head is None else head
     x += counter.to_bytes(1, 'big')
     x += command.to_bytes(2, 'big')
     x += crc16.checksum(x).to_bytes(2, 'big')
@@ -0,0 +1,133 @@
+import time
+import threading
+from struct import unpack
+from . import baseband
+from .radio import clamp
+
+# The physical remote is received as in scripts/scan_lightbar_remote.py.
+# Each turn or press of the knob is a burst of identical frames, with the same
+# sequence counter. Only the first correct frame of each burst is used.
+
+
+def decode(raw: bytes):
+    """Decode a received packet. Return a dict, or None if the CRC is wrong.
+
+    The 12 received bytes (96 bits) are 15 bits from the preamble, the 9 byte
+    payload (id, separator, counter, command and CRC) and 9 junk bits.
+    """
+    data = (int.from_bytes(raw, "big") >> 9) & ((1 << 72) - 1)
+    keys = ["id", "separator", "counter", "command", "crc"]
+    values = unpack('>3s s s 2s 2s', data.to_bytes(9, 'big'))
+    packet = dict(zip(keys, (int.from_bytes(x, "big") for x in values)))
+    if packet["separator"] != baseband.separator:
+        return None
+    x = baseband.packet(packet["id"], packet["command"], packet["counter"])
+    if int.from_bytes(x[-2:], "big") != packet["crc"]:
+        return None
+    return packet
+
+
+def step(command: int):
+    """Signed step of a turning command (e.g. 0x0201 -> 1, 0x03FF -> -1)"""
+    low = command & 0xFF
+    return low - 256 if low >= 0x80 else low
+
+
+class State:
+    """Tracked state of a light bar (brightness and color_temp in range(0, 16)).
+
+    None means unknown. The state is updated with the commands of the remote
+    (method apply) or with the values set by the library (method update).
+    Both return a dict with the changed fields.
+    """
+
+    def __init__(self, on: bool = True, brightness: int = None, color_temp: int = None):
+        self.on = on
+        self.brightness = brightness
+        self.color_temp = color_temp
+        self._lock = threading.Lock()
+
+    def as_dict(self):
+        return {"on": self.on, "brightness": self.brightness, "color_temp": self.color_temp}
+
+    def update(self, **fields):
+        with self._lock:
+            delta = {k: v for k, v in fields.items() if getattr(self, k) != v}
+            for k, v in delta.items():
+                setattr(self, k, v)
+            return delta
+
+    def apply(self, command: int):
+        """Apply a command code, as the light bar does"""
+        group = command >> 8
+        if group == 0x01:
+            return self.update(on=not self.on)
+        if group in (0x06, 0x07):  # Reset, medium brightness and warm color
+            return self.update(brightness=8, color_temp=0)
+        if group in (0x02, 0x03):
+            return self.update(color_temp=self._step(self.color_temp, step(command)))
+        if group in (0x04, 0x05):
+            return self.update(brightness=self._step(self.brightness, step(command)))
+        return {}  # Ignored by the bar
+
+    @staticmethod
+    def _step(value: int, delta: int):
+        if abs(delta) >= 15:  # Saturate, known value
+            return clamp(15 if delta > 0 else 0)
+        return None if value is None else clamp(value + delta)
+
+
+class Bridge:
+    """Listens to the physical remote with a Lightbar, between its transmissions.
+
+    The commands of the remote (same remote id as the Lightbar) are decoded,
+    de-duplicated by sequence counter and applied to the state. Echoes of the
+    packets sent by the Lightbar are ignored. Each change of the state is
+    passed to on_change(delta), from the bridge thread.
+    """
+
+    def __init__(self, bar, state: State = None, on_change=None, poll_s: float = 0.002):
+        self.bar = bar
+        self.state = State() if state is None else state
+        self.on_change = on_change
+        self.poll_s = poll_s
+        self.last_counter = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Process one received packet. Return the state delta, or None if
+        nothing was received."""
+        raw = self.bar.receive()
+        if raw is None:
+            return None
+        packet = decode(raw)
+        if packet is None or packet["id"] != self.bar.id:
+            return {}
+        if packet["counter"] == self.last_counter:  # Same burst
+            return {}
+        key = bytes([packet["counter"]]) + packet["command"].to_bytes(2, 'big')
+        if key in self.bar.sent:  # Echo of our own transmissions
+            return {}
+        self.last_counter = packet["counter"]
+        delta = self.state.apply(packet["command"])
+        if delta and self.on_change is not None:
+            self.on_change(delta)
+        return delta
+
+    def run(self):
+        self.bar.listen()
+        while not self._stop.is_set():
+            if self.poll() is None:
+                time.sleep(self.poll_s)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
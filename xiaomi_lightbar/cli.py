@@ -0,0 +1,184 @@
+import os
+import sys
+import stat
+import time
+import shlex
+import json
+import argparse
+import pyrf24
+from .radio import Lightbar
+from .scene import Scene, SceneCache, DEFAULT_CACHE
+
+description = """
+    Control the Xiaomi Mi Computer Monitor Lightbar with a nRF24 module.
+
+    The stream command keeps the radio open, and reads commands from stdin or a
+    FIFO, one per line, with the same syntax as the command line
+    (e.g. "brightness 8", "send 0x0100").
+"""
+
+# The counter of each remote id is kept between calls, the bar rejects a
+# command with the same counter as the previous one
+COUNTERS = os.path.join(os.path.dirname(DEFAULT_CACHE), "counters.json")
+
+POWER = {
+    "MIN": pyrf24.RF24_PA_MIN,
+    "LOW": pyrf24.RF24_PA_LOW,
+    "HIGH": pyrf24.RF24_PA_HIGH,
+    "MAX": pyrf24.RF24_PA_MAX,
+}
+
+
+def int_range(low: int, high: int, base: int = 10):
+    """argparse type, int in [low, high]"""
+    def parse(x: str):
+        value = int(x, base)
+        if not low <= value <= high:
+            fmt = "#x" if base == 16 else "d"
+            raise argparse.ArgumentTypeError(f"{x} out of range [{low:{fmt}}, {high:{fmt}}]")
+        return value
+    return parse
+
+
+def load_counter(remote_id: int, path: str = COUNTERS):
+    """Return the next counter of a remote id, saved by save_counter"""
+    try:
+        with open(path) as f:
+            return json.load(f).get(f"{remote_id:06x}", 0) % 256
+    except (OSError, ValueError):
+        return 0
+
+
+def save_counter(remote_id: int, counter: int, path: str = COUNTERS):
+    """Save the next counter of a remote id. Only warn if it fails."""
+    try:
+        with open(path) as f:
+            counters = json.load(f)
+    except (OSError, ValueError):
+        counters = {}
+    counters[f"{remote_id:06x}"] = counter
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(counters, f)
+    except OSError as e:
+        print(f"lightbar: warning: counter not saved: {e}", file=sys.stderr)
+
+
+def command_parser():
+    """Parser for the commands, in the command line or in the stream"""
+    parser = argparse.ArgumentParser(prog="lightbar", add_help=False, exit_on_error=False)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("on_off", help="Turn on or off")
+    commands.add_parser("reset", help="Reset, medium brightness, warm color")
+    for name in ("cooler", "warmer", "higher", "lower"):
+        cmd = commands.add_parser(name, help=f"Relative change, {name}")
+        cmd.add_argument("step", type=int, nargs="?", default=1, help="1 to 15")
+    cmd = commands.add_parser("brightness", help="Set the brightness")
+    cmd.add_argument("value", type=int, help="0 lowest, 15 highest")
+    cmd = commands.add_parser("temp", help="Set the color temperature")
+    cmd.add_argument("value", type=int, help="0 warmest, 15 coldest")
+    cmd = commands.add_parser("send", help="Send a raw command code")
+    cmd.add_argument("code", type=int_range(0, 0xFFFF, 16), help="2 byte hex code (e.g. 0x0100)")
+    cmd.add_argument("--counter", type=int_range(0, 255), default=None, help="0 to 255")
+    cmd = commands.add_parser("scene", help="Play a scene, or define it and play it")
+    cmd.add_argument("name", type=str)
+    cmd.add_argument("--brightness", type=int, default=None, help="Define the scene, 0 to 15")
+    cmd.add_argument("--temp", type=int, default=None, help="Define the scene, 0 to 15")
+    cmd = commands.add_parser("stream", help="Read commands from stdin or a FIFO")
+    cmd.add_argument("input", type=str, nargs="?", default="-", help="Path, - for stdin (default)")
+    return parser
+
+
+def run(bar: Lightbar, args, scenes: SceneCache = None):
+    """Run a parsed command"""
+    if args.command in ("on_off", "reset"):
+        getattr(bar, args.command)()
+    elif args.command in ("cooler", "warmer", "higher", "lower"):
+        getattr(bar, args.command)(args.step)
+    elif args.command == "brightness":
+        bar.brightness(args.value)
+    elif args.command == "temp":
+        bar.color_temp(args.value)
+    elif args.command == "send":
+        bar.send(args.code, args.counter)
+    elif args.command == "scene":
+        scenes = SceneCache() if scenes is None else scenes
+        if args.brightness is not None or args.temp is not None:
+            scenes.add(Scene(args.name, args.brightness, args.temp))
+        scenes.play(args.name, bar)
+
+
+def stream(bar: Lightbar, parser, path: str, timing: bool = False):
+    """Run the commands read from a file, one per line.
+
+    A FIFO is opened again when the writer closes it.
+    """
+    fifo = path != "-" and stat.S_ISFIFO(os.stat(path).st_mode)
+    scenes = SceneCache()
+    while True:
+        f = sys.stdin if path == "-" else open(path)
+        with f:
+            for line in f:
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                start = time.monotonic()
+                try:
+                    args = parser.parse_args(words)
+                    if args.command == "stream":
+                        raise argparse.ArgumentError(None, "nested stream")
+                    run(bar, args, scenes)
+                except SystemExit:  # Invalid command, already reported by argparse
+                    continue
+                except (argparse.ArgumentError, KeyError, ValueError, OverflowError) as e:
+                    print(f"Error: {line.strip()}: {e}", file=sys.stderr)
+                    continue
+                if timing:
+                    print(f"{line.strip()}\t{(time.monotonic()-start)*1000:.1f} ms", flush=True)
+        if not fifo:
+            break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lightbar", description=description, parents=[command_parser()],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--channel", type=int, default=6, help="6 (default), 15, 43, 68 (or +1) -> 2406 MHz, 2043 MHz, 2068 MH")
+    parser.add_argument("-p", "--power", type=str, default="LOW", choices=list(POWER), help="Change the power level")
+    parser.add_argument("-i", "--id", type=int_range(0, 0xFFFFFF, 16), default=0xABCDEF, help="ID of the remote")
+    parser.add_argument("--ce_pin", type=int, default=25, help="CE Pin")
+    parser.add_argument("--csn_pin", type=int, default=0, help="CSN Pin")
+    parser.add_argument("-t", "--timing", action="store_true", help="Print the time of each command")
+    args = parser.parse_args(argv)
+
+    if args.command == "stream" and args.input != "-" and not os.path.exists(args.input):
+        parser.error(f"stream: no such file or FIFO: {args.input}")
+
+    bar = Lightbar(args.ce_pin, args.csn_pin, args.id)
+    bar.radio.channel = args.channel
+    bar.radio.pa_level = POWER[args.power]
+    bar.counter = load_counter(bar.id)
+
+    if args.command == "stream":
+        try:
+            stream(bar, command_parser(), args.input, args.timing)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            parser.exit(1, f"lightbar: error: {e}\n")
+        finally:
+            save_counter(bar.id, bar.counter)
+    else:
+        start = time.monotonic()
+        try:
+            run(bar, args)
+        except KeyError as e:
+            parser.exit(1, f"lightbar: error: unknown scene {e}\n")
+        finally:
+            save_counter(bar.id, bar.counter)
+        if args.timing:
+            print(f"{args.command}\t{(time.monotonic()-start)*1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
 import time
+import heapq
+import threading
+from collections import deque
+from contextlib import contextmanager, ExitStack
 import pyrf24
 from . import baseband
 
@@ -11,25 +15,54 @@ def clamp(x: int):
     return min(max(x, 0), 15)
 
 
+def setup_radio(ce_pin: int, csn_pin: int):
+    """Configure a nRF24L01 module to transmit light bar packets"""
+    radio = pyrf24.RF24()
+    if not radio.begin(ce_pin, csn_pin):
+        raise OSError("nRF24L01 hardware is not responding")
+    radio.channel = 6  # 6, 15, 43, 68 (or +1) -> 2406 MHz, 2015 MHz, 2043 MHz, 2068 MHz
+    radio.pa_level = pyrf24.RF24_PA_LOW
+    radio.data_rate = pyrf24.RF24_2MBPS
+    radio.set_retries(0, 0)  # no repetitions, done manually in method send
+    radio.listen = False
+    radio.dynamic_payloads = False
+    radio.payload_size = 17
+    radio.open_tx_pipe(bytes(5*[0x55]))  # Address, really sync sequence
+    return radio
+
+
+def setup_rx(radio):
+    """Configure a nRF24L01 module to receive the packets of a remote.
+
+    See scripts/scan_lightbar_remote.py and bridge.decode for the details.
+    """
+    radio.crc_length = pyrf24.RF24_CRC_DISABLED
+    radio.payload_size = 12  # More than necessary, some bits are stripped
+    radio.address_width = 5
+    radio.open_rx_pipe(1, baseband.preamble >> 24)  # 5 first bytes of preamble
+    radio.listen = True
+
+
 class Lightbar:
     """Implements a Xiaomi light bar controller with a nRF24L01 module"""
 
     def __init__(self, ce_pin: int, csn_pin: int, remote_id: int):
-        self.radio = pyrf24.RF24()
-        if not self.radio.begin(ce_pin, csn_pin):
-            raise OSError("nRF24L01 hardware is not responding")
-        self.radio.channel = 6  # 6, 15, 43, 68 (or +1) -> 2406 MHz, 2015 MHz, 2043 MHz, 2068 MHz
-        self.radio.pa_level = pyrf24.RF24_PA_LOW
-        self.radio.data_rate = pyrf24.RF24_2MBPS
-        self.radio.set_retries(0, 0)  # no repetitions, done manually in method send
-        self.radio.listen = False
-        self.radio.dynamic_payloads = False
-        self.radio.payload_size = 17
-        self.radio.open_tx_pipe(bytes(5*[0x55]))  # Address, really sync sequence
+        self.radio = setup_radio(ce_pin, csn_pin)
         self.repetitions = 20
         self.delay_s = 0.01
         self.counter = 0
         self.id = remote_id  # Xiaomi remote id, 3-byte int (0x112233)
+        self.lock = threading.RLock()  # Shared radio, see listen and receive
+        self.listening = False
+        self.sent = deque(maxlen=32)  # (counter, command) of the last packets sent
+
+    def next_counter(self):
+        """Return the internal counter, and increment it"""
+        counter = self.counter
+        self.counter += 1
+        if self.counter > 255:
+            self.counter = 0
+        return counter
 
     def send(self, code: int, counter: int = None):
         """Send a command to the Xiaomi light bar.
@@ -40,14 +73,64 @@ class Lightbar:
                  If None, use an internal counter that increments one.
         """
         if counter is None:
-            counter = self.counter
-            self.counter += 1
-            if self.counter > 255:
-                self.counter = 0
+            counter = self.next_counter()
         pkt = baseband.packet(self.id, code, counter)
-        for _ in range(self.repetitions):
-            self.radio.write(pkt)
-            time.sleep(self.delay_s)
+        self.transmit(pkt)
+
+    def transmit(self, pkt: bytes, repetitions: int = None):
+        """Transmit a packet as a burst of repetitions.
+
+        Arguments:
+        pkt: packet built with baseband.packet
+        repetitions: number of repetitions. If None, use self.repetitions.
+        """
+        self.transmit_all([pkt], repetitions)
+
+    def transmit_all(self, pkts: list, repetitions: int = None):
+        """Transmit several packets in a single loop, one burst after the other.
+
+        Arguments:
+        pkts: packets built with baseband.packet, in order
+        repetitions: number of repetitions. If None, use self.repetitions.
+        """
+        if repetitions is None:
+            repetitions = self.repetitions
+        self.sent.extend(pkt[12:15] for pkt in pkts)
+        with self.transmitting():
+            for pkt in pkts:
+                for _ in range(repetitions):
+                    self.radio.write(pkt)
+                    time.sleep(self.delay_s)
+
+    @contextmanager
+    def transmitting(self):
+        """Hold the radio, in transmit mode. See method listen."""
+        with self.lock:
+            if self.listening:
+                self.radio.listen = False
+                self.radio.crc_length = self._tx_crc_length
+                self.radio.payload_size = 17
+            try:
+                yield self.radio
+            finally:
+                if self.listening:
+                    setup_rx(self.radio)
+
+    def listen(self):
+        """Receive the packets of the remote between transmissions"""
+        with self.lock:
+            if not self.listening:
+                self._tx_crc_length = self.radio.crc_length
+                setup_rx(self.radio)
+                self.listening = True
+
+    def receive(self):
+        """Return a raw received packet, or None. See method listen."""
+        with self.lock:
+            has_payload, _ = self.radio.available_pipe()
+            if has_payload:
+                return self.radio.read(self.radio.payload_size)
+        return None
 
     @property
     def is_available(self):
@@ -92,3 +175,283 @@ class Lightbar:
         # This delays the change until next update! Then adjust.
         self.send(0x0300-16, counter)
         self.cooler(value, counter2)
+
+
+class Scheduler:
+    """Interleaves the commands for several light bars on a shared radio.
+
+    Each command is repeated as in Lightbar.send, one packet each delay_s
+    seconds. The idle time between repetitions is used to transmit the
+    packets for the other remote ids. The commands for the same remote id
+    are kept in order, one burst after the other.
+
+    The counters of the remote ids of bars (Lightbar objects) are taken from
+    them, so that the bars can also be used directly. The other remote ids use
+    an internal counter of the scheduler. The radio of the bars is held in
+    transmit mode during method run, and the packets are recorded in their
+    sent list, as with Lightbar.transmit.
+    """
+
+    def __init__(self, radio, repetitions: int = 20, delay_s: float = 0.01,
+                 bars: list = None):
+        self.radio = radio
+        self.repetitions = repetitions
+        self.delay_s = delay_s
+        self.bars = {bar.id: bar for bar in bars or []}  # remote id -> Lightbar
+        self.counters = {}  # remote id -> internal counter, without Lightbar
+        self.latency = {}   # remote id -> seconds, from submission to last packet
+        self.commands = 0   # Commands transmitted
+        self.airtime_s = 0.0  # Seconds spent writing packets, without the delays
+        self._queues = {}   # remote id -> deque of (packet, submission time)
+        self._lock = threading.Lock()
+
+    def next_counter(self, remote_id: int):
+        """Return the counter of a remote id, and increment it"""
+        if remote_id in self.bars:
+            return self.bars[remote_id].next_counter()
+        counter = self.counters.get(remote_id, 0)
+        self.counters[remote_id] = (counter + 1) % 256
+        return counter
+
+    def submit(self, remote_id: int, code: int, counter: int = None):
+        """Queue a command for the light bar of a remote id.
+
+        Arguments:
+        remote_id: id of the remote, as 3 byte long int (e.g. 0x5421FE)
+        code: 2 byte int (e.g. 0x0100)
+        counter: int in range(0, 256) to reject repeated packets.
+                 If None, use the counter of the remote id (see next_counter).
+        """
+        with self._lock:
+            if counter is None:
+                counter = self.next_counter(remote_id)
+            pkt = baseband.packet(remote_id, code, counter)
+            if remote_id in self.bars:
+                self.bars[remote_id].sent.append(pkt[12:15])  # Not an echo for a Bridge
+            queue = self._queues.setdefault(remote_id, deque())
+            queue.append((pkt, time.monotonic()))
+
+    def busy(self, remote_id: int):
+        """True if a command of a remote id is queued or being transmitted"""
+        with self._lock:
+            return remote_id in self._queues
+
+    @property
+    def pending(self):
+        """Number of queued commands, not yet transmitted"""
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def clear(self):
+        """Discard the queued commands. Return their number."""
+        with self._lock:
+            count = sum(len(q) for q in self._queues.values())
+            self._queues.clear()
+            return count
+
+    def _pop(self, remote_id: int):
+        with self._lock:
+            queue = self._queues.get(remote_id)
+            if not queue:
+                self._queues.pop(remote_id, None)
+                return None
+            return queue.popleft()
+
+    def _admit(self, heap: list, bursts: dict, started: dict):
+        """Start the bursts of the remote ids submitted and not yet in bursts"""
+        now = time.monotonic()
+        with self._lock:
+            for remote_id, queue in self._queues.items():
+                if remote_id not in bursts and queue:
+                    pkt, submitted = queue.popleft()
+                    bursts[remote_id] = [pkt, self.repetitions]
+                    started[remote_id] = submitted
+                    heapq.heappush(heap, (now, remote_id))
+
+    def run(self):
+        """Transmit the queued commands, interleaving the remote ids, until
+        no command is left (including the ones submitted meanwhile).
+
+        Returns a dict with the latency of each remote id (seconds from the
+        submission of its first command to its last packet)
+        """
+        heap = []  # (next packet due, remote id)
+        bursts = {}  # remote id -> [packet, remaining repetitions]
+        started = {}  # remote id -> submission time of its first command
+        latency = {}
+        self._admit(heap, bursts, started)
+
+        with ExitStack() as stack:
+            if heap:
+                for bar in self.bars.values():
+                    stack.enter_context(bar.transmitting())
+
+            while heap:
+                due, remote_id = heapq.heappop(heap)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                burst = bursts[remote_id]
+                start = time.monotonic()
+                self.radio.write(burst[0])
+                now = time.monotonic()
+                self.airtime_s += now - start
+                burst[1] -= 1
+
+                if burst[1] <= 0:
+                    self.commands += 1
+                    item = self._pop(remote_id)
+                    if item is None:  # Done with this remote id
+                        latency[remote_id] = now - started[remote_id]
+                        del bursts[remote_id]
+                    else:
+                        bursts[remote_id] = [item[0], self.repetitions]
+                if remote_id in bursts:
+                    heapq.heappush(heap, (now + self.delay_s, remote_id))
+                self._admit(heap, bursts, started)
+
+        self.latency.update(latency)
+        return latency
+
+
+CHANNELS = (6, 15, 43, 68)  # -> 2406 MHz, 2015 MHz, 2043 MHz, 2068 MHz
+
+
+class RadioPool:
+    """Drives several nRF24L01 modules in parallel, each one with a transmit thread.
+
+    Each remote id is assigned to a radio, with the mapping (remote id -> index
+    of the radio) or else to the least loaded one. Each radio interleaves the
+    commands of its remote ids with a Scheduler. Critical commands can be
+    duplicated in all the radios, in different channels, with the same counter
+    (the bar rejects the repeated ones). To keep the order of the commands of
+    a remote id, method send waits until its previous commands are transmitted
+    by the other radios (or by all of them, for a critical command).
+
+    An error of a radio (e.g. in its write method) discards the queued
+    commands of that radio, and is raised by the next call to method wait.
+
+    Arguments:
+    radios: configured radios, see setup_radio (or any object with method write)
+    mapping: dict of remote id -> index of the radio, optional
+    """
+
+    def __init__(self, radios: list, mapping: dict = None,
+                 repetitions: int = 20, delay_s: float = 0.01):
+        self.schedulers = [Scheduler(radio, repetitions, delay_s) for radio in radios]
+        self.mapping = dict(mapping or {})
+        self.delay_s = delay_s
+        self.counters = {}  # remote id -> internal counter
+        self._errors = []  # Errors of the workers, raised by method wait
+        self._start = time.monotonic()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wake = [threading.Event() for _ in radios]
+        self._idle = [threading.Event() for _ in radios]
+        self._threads = []
+        for i in range(len(radios)):
+            self._idle[i].set()
+            thread = threading.Thread(target=self._worker, args=(i,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @classmethod
+    def from_pins(cls, pins: list, mapping: dict = None, channels: tuple = CHANNELS,
+                  repetitions: int = 20, delay_s: float = 0.01):
+        """Set up the radios from a list of (ce_pin, csn_pin), one channel each"""
+        radios = [setup_radio(ce_pin, csn_pin) for ce_pin, csn_pin in pins]
+        for i, radio in enumerate(radios):
+            radio.channel = channels[i % len(channels)]
+        return cls(radios, mapping, repetitions, delay_s)
+
+    def assign(self, remote_id: int):
+        """Return the index of the radio of a remote id, assigning one if needed"""
+        with self._lock:
+            if remote_id not in self.mapping:
+                assigned = list(self.mapping.values())
+                load = [(s.pending + assigned.count(i), i) for i, s in enumerate(self.schedulers)]
+                self.mapping[remote_id] = min(load)[1]
+            return self.mapping[remote_id]
+
+    def send(self, remote_id: int, code: int, counter: int = None, critical: bool = False):
+        """Queue a command for the light bar of a remote id.
+
+        Arguments:
+        remote_id: id of the remote, as 3 byte long int (e.g. 0x5421FE)
+        code: 2 byte int (e.g. 0x0100)
+        counter: int in range(0, 256) to reject repeated packets.
+                 If None, use an internal counter per remote id.
+        critical: if True, transmit it with all the radios
+        """
+        assigned = self.assign(remote_id)
+        indices = range(len(self.schedulers)) if critical else [assigned]
+        # Wait for the previous commands in other radios: the bar only rejects
+        # a counter equal to the previous one, a late copy would be run again
+        others = [i for i in range(len(self.schedulers)) if critical or i != assigned]
+        while any(self.schedulers[i].busy(remote_id) for i in others):
+            time.sleep(self.delay_s)
+        with self._lock:
+            if counter is None:
+                counter = self.counters.get(remote_id, 0)
+                self.counters[remote_id] = (counter + 1) % 256
+            for i in indices:
+                self.schedulers[i].submit(remote_id, code, counter)
+                self._idle[i].clear()
+                self._wake[i].set()
+
+    def _worker(self, i: int):
+        scheduler = self.schedulers[i]
+        try:
+            while True:
+                self._wake[i].wait()
+                self._wake[i].clear()
+                if self._closed:
+                    return
+                while True:
+                    with self._lock:
+                        if not scheduler.pending:
+                            self._idle[i].set()
+                            break
+                    try:
+                        scheduler.run()
+                    except Exception as e:  # Raised by method wait
+                        with self._lock:
+                            self._errors.append(e)
+                            scheduler.clear()
+        finally:
+            self._idle[i].set()  # Do not block method wait, even if the thread dies
+
+    def utilization(self):
+        """Fraction of time spent writing packets by each radio (airtime,
+        without the delays between the repetitions)"""
+        elapsed = time.monotonic() - self._start
+        return [scheduler.airtime_s / elapsed for scheduler in self.schedulers]
+
+    @property
+    def commands(self):
+        """Commands transmitted by each radio"""
+        return [scheduler.commands for scheduler in self.schedulers]
+
+    def wait(self):
+        """Wait until all the queued commands are transmitted.
+
+        Raise the first error of the radios since the previous call, if any.
+        """
+        for idle, thread in zip(self._idle, self._threads):
+            while not idle.wait(0.1) and thread.is_alive():
+                pass
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._closed = True
+            for wake in self._wake:
+                wake.set()
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,138 @@
+import os
+import json
+from . import baseband
+from .radio import clamp
+
+# A scene is a target state (brightness and/or color temperature) compiled once
+# into the sequence of command codes that sets it, for a given remote id.
+# The counters are filled in when the scene is played.
+
+DEFAULT_CACHE = os.path.expanduser("~/.cache/xiaomi_lightbar/scenes.json")
+
+
+class Scene:
+    """A named target state of the light bar"""
+
+    def __init__(self, name: str, brightness: int = None, color_temp: int = None):
+        self.name = name
+        self.brightness = None if brightness is None else clamp(brightness)
+        self.color_temp = None if color_temp is None else clamp(color_temp)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Scene from a dict, e.g. {"name": "coding", "brightness": 9, "color_temp": 12}.
+
+        brightness and color_temp are optional, in range(0, 16).
+        Raise ValueError if the dict is not a valid scene.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("name"), str) or not data["name"]:
+            raise ValueError(f"not a scene, a name is required: {data!r}")
+        for key in ("brightness", "color_temp"):
+            value = data.get(key)
+            if value is not None and (type(value) is not int or not 0 <= value <= 15):
+                raise ValueError(f"{key} must be an int from 0 to 15: {value!r}")
+        return cls(data["name"], data.get("brightness"), data.get("color_temp"))
+
+    def codes(self):
+        """Command codes that set the state, as Lightbar.brightness and color_temp"""
+        codes = []
+        if self.brightness is not None:
+            codes += [0x0500-16, 0x0400 + self.brightness]  # Saturate lowest, then adjust
+        if self.color_temp is not None:
+            codes += [0x0300-16, 0x0200 + self.color_temp]  # Saturate warmest, then adjust
+        return codes
+
+    def compile(self, remote_id: int):
+        return Program(remote_id, self.codes())
+
+
+class Program:
+    """A scene compiled for a remote id, ready to be played"""
+
+    def __init__(self, remote_id: int, codes: list):
+        self.remote_id = remote_id
+        self.codes = codes
+        self.head = baseband.header(remote_id)
+
+    def play(self, bar):
+        """Transmit the program with a Lightbar, using its internal counter"""
+        pkts = [baseband.packet(self.remote_id, code, bar.next_counter(), self.head)
+                for code in self.codes]
+        bar.transmit_all(pkts)
+
+
+PRESETS = {
+    scene.name: scene for scene in (
+        Scene("reading", brightness=12, color_temp=10),
+        Scene("night", brightness=0, color_temp=0),
+        Scene("presentation", brightness=15, color_temp=15),
+    )
+}
+
+
+class SceneCache:
+    """Scenes and their compiled programs, stored in a JSON file.
+
+    Arguments:
+    path: JSON file. If None, the scenes are only kept in memory.
+    scenes: dict of name -> Scene. If None, use PRESETS.
+            The scenes stored in the file are added to them, and the
+            removed ones are removed from them.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE, scenes: dict = None):
+        self.path = path
+        self.scenes = dict(PRESETS if scenes is None else scenes)
+        self._programs = {}  # "name:remote id" -> dict with state and codes
+        self.removed = set()  # Names of the removed scenes of the scenes argument
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            for name, state in data.get("scenes", {}).items():
+                self.scenes[name] = Scene(name, state["brightness"], state["color_temp"])
+            self._programs = data.get("programs", {})
+            self.removed = set(data.get("removed", []))
+            for name in self.removed:
+                self.scenes.pop(name, None)
+
+    def add(self, scene: Scene):
+        """Add or replace a scene, and store it"""
+        self.scenes[scene.name] = scene
+        self.removed.discard(scene.name)
+        self.save()
+
+    def remove(self, name: str):
+        """Remove a scene and its programs, and store it (a removed preset
+        stays removed)"""
+        del self.scenes[name]
+        self.removed.add(name)
+        self._programs = {key: entry for key, entry in self._programs.items()
+                          if key.rsplit(":", 1)[0] != name}
+        self.save()
+
+    def program(self, name: str, remote_id: int):
+        """Return the Program of a scene, compiling it if not cached"""
+        scene = self.scenes[name]
+        key = f"{name}:{remote_id:06x}"
+        entry = self._programs.get(key)
+        state = [scene.brightness, scene.color_temp]
+        if entry is None or entry["state"] != state:  # Missing or outdated
+            entry = {"state": state, "codes": scene.codes()}
+            self._programs[key] = entry
+            self.save()
+        return Program(remote_id, entry["codes"])
+
+    def play(self, name: str, bar):
+        """Play a scene with a Lightbar. Return the Scene."""
+        self.program(name, bar.id).play(bar)
+        return self.scenes[name]
+
+    def save(self):
+        if self.path is None:
+            return
+        scenes = {name: {"brightness": scene.brightness, "color_temp": scene.color_temp}
+                  for name, scene in self.scenes.items()}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"scenes": scenes, "programs": self._programs,
+                       "removed": sorted(self.removed)}, f, indent=2)
@@ -0,0 +1,166 @@
+import time
+import threading
+from . import baseband
+from .radio import clamp
+
+# A fade is planned as a sequence of single-step relative commands (the ones
+# sent by the remote when the knob is turned slowly), spread in time.
+# The intermediate steps are sent with fewer repetitions than a normal command,
+# since missing one of them is not noticeable. The last step of each parameter
+# is a full burst, otherwise the bar could be left one step off the target.
+
+# Single-step codes: (up, down) for each parameter
+STEP_CODES = {
+    "brightness": (0x0401, 0x05FF),  # higher, lower
+    "color_temp": (0x0201, 0x03FF),  # cooler, warmer
+}
+
+
+def plan(name: str, start: int, target: int, duration_s: float):
+    """Plan the fade of a parameter as a list of steps.
+
+    Arguments:
+    name: "brightness" or "color_temp"
+    start: current value, in range(0, 16)
+    target: final value, in range(0, 16)
+    duration_s: duration of the fade, in seconds
+
+    Returns a list of (time offset in seconds, command code, name, value after
+    the step) tuples.
+    """
+    start, target = clamp(start), clamp(target)
+    up, down = STEP_CODES[name]
+    n = abs(target - start)
+    sign = 1 if target > start else -1
+    code = up if sign > 0 else down
+    return [(duration_s*(i+1)/n, code, name, start + sign*(i+1))
+            for i in range(n)]
+
+
+class Transition:
+    """A fade, precomputed as a timed sequence of packets for a Lightbar.
+
+    The packets and their counters are built in advance. Run it with
+    method run, in any thread, and stop it with method cancel.
+    """
+
+    def __init__(self, bar, steps: list, repetitions: int = 5):
+        self.bar = bar
+        self.repetitions = repetitions  # For the intermediate steps
+        self.values = {}  # name -> last value sent
+        steps = sorted(steps)
+        last = {name: i for i, (_, _, name, _) in enumerate(steps)}  # Last step of each name
+        # (time, packet, name, value, repetitions), None for a full burst
+        self.packets = [(t, baseband.packet(bar.id, code, bar.next_counter()), name, value,
+                         None if last[name] == i else repetitions)
+                        for i, (t, code, name, value) in enumerate(steps)]
+        self._cancelled = threading.Event()
+
+    @property
+    def duration(self):
+        return self.packets[-1][0] if self.packets else 0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        """Transmit the steps on schedule. Return False if cancelled."""
+        start = time.monotonic()
+        for t, pkt, name, value, repetitions in self.packets:
+            if self._cancelled.wait(max(start + t - time.monotonic(), 0)):
+                return False
+            self.values[name] = value
+            self.bar.transmit(pkt, repetitions)
+        return True
+
+
+class TransitionEngine:
+    """Runs the transitions of a Lightbar in a background thread.
+
+    The engine keeps track of the brightness and color temperature, to plan
+    the fades. A new target cancels the running transition, starting from
+    the value already reached.
+
+    on_done, optional, is called with the dict of the values reached when a
+    transition ends (finished or cancelled, not stopped), from its thread.
+    """
+
+    def __init__(self, bar, repetitions: int = 5, on_done=None):
+        self.bar = bar
+        self.repetitions = repetitions
+        self.on_done = on_done
+        self.brightness = None  # Unknown, until set
+        self.color_temp = None
+        self._transition = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Stop the running transition, if any, and wait for it"""
+        with self._lock:
+            if self._transition is not None:
+                self._transition.cancel()
+        self.wait()
+
+    def stop(self):
+        """Stop the running transition, if any, without waiting for it (e.g.
+        from another thread). The values it reached are discarded: set the
+        attributes brightness and color_temp after calling it."""
+        with self._lock:
+            if self._transition is not None:
+                self._transition.cancel()
+                self._transition = None  # The thread is joined by method wait
+
+    def wait(self):
+        """Wait for the running transition to finish"""
+        with self._lock:
+            transition, thread = self._transition, self._thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if transition is not None and transition is self._transition:
+                for name, value in transition.values.items():
+                    setattr(self, name, value)  # Value reached by the transition
+                self._transition = None
+            if thread is self._thread:
+                self._thread = None
+
+    def _run(self, transition: Transition):
+        transition.run()
+        with self._lock:
+            stopped = transition is not self._transition
+        if not stopped and self.on_done is not None:
+            self.on_done(dict(transition.values))
+
+    def set(self, brightness: int = None, color_temp: int = None, duration_s: float = 0):
+        """Set brightness and/or color temperature, in range(0, 16).
+
+        If duration_s > 0 and the current value is known, fade in a background
+        thread and return the Transition. Otherwise, set the value at once
+        (blocking) and return None.
+        """
+        self.cancel()
+        steps = []
+        for name, target in (("brightness", brightness), ("color_temp", color_temp)):
+            if target is None:
+                continue
+            target = clamp(target)
+            start = getattr(self, name)
+            if start is None or duration_s <= 0:
+                getattr(self.bar, name)(target)  # Absolute value, saturate and adjust
+                setattr(self, name, target)
+            else:  # Updated as the steps are sent, see method cancel
+                steps += plan(name, start, target, duration_s)
+
+        if not steps:
+            return None
+        transition = Transition(self.bar, steps, self.repetitions)
+        with self._lock:
+            self._transition = transition
+            self._thread = threading.Thread(target=self._run, args=(transition,), daemon=True)
+            self._thread.start()
+        return transition